@@ -1,35 +1,337 @@
 # 표준 라이브러리
 import datetime
-from io import BytesIO
+import os
+import threading
+import time
+from io import BytesIO, StringIO
 
 # 서드파티 라이브러리
 import streamlit as st
+import numpy as np
 import pandas as pd
 import FinanceDataReader as fdr
 import plotly.graph_objects as go
+import plotly.io as pio
+import httpx
+import pyarrow as pa
+import redis
+from cachetools import TLRUCache
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    # numba가 없는 환경(미지원 파이썬/NumPy 버전 등)에서는 NumPy 누적합으로 계산
+    HAS_NUMBA = False
+
+# --- 설정 ---
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+KRX_LIST_URL = 'http://kind.krx.co.kr/corpgeneral/corpList.do?method=download&searchType=13'
+# 캐시 직렬화 형식이 바뀌면 버전을 올려 이전 형식의 값과 키가 겹치지 않게 한다
+KRX_CACHE_PREFIX = 'krx:v2'
+OHLCV_CACHE_PREFIX = 'ohlcv:v2'
+KRX_LIST_TTL = 60 * 60 * 24  # 상장사 명단은 하루 단위로 갱신
+KRX_LIST_FALLBACK_TTL = 60 * 60 * 24 * 30  # KRX 장애 대비용 최근 명단 보관 기간
+KRX_LIST_FAILURE_TTL = 60  # 명단 다운로드 실패 후 재시도 없이 대체 명단을 쓰는 시간
+OHLCV_TTL_TODAY = 60  # 오늘이 포함된 조회는 장중 가격이 바뀌므로 짧게
+OHLCV_TTL_HISTORY = 60 * 60 * 24 * 30  # 과거 구간은 바뀌지 않으므로 길게
+OHLCV_INDEX_COL = 'Date'  # 캐시 직렬화 시 OHLCV 날짜 인덱스 컬럼명
+OHLCV_L1_MAXSIZE = 512  # 프로세스 내 캐시에 보관할 (종목, 기간) 조합 수
+MA_WINDOWS = (20, 60, 120)  # 이동평균 기간 (MA 커널의 반환 순서와 같다)
+MA_KERNEL_SIGNATURE = 'UniTuple(float64[:], 3)(float64[:])'
+CHART_MAX_POINTS = 2000  # 차트로 보내는 최대 봉 개수
+EXPORT_CACHE_TTL = 60 * 10  # 다운로드 파일(XLSX/Parquet) 캐시 보관 시간
+EXPORT_CACHE_MAX_ENTRIES = 32  # 다운로드 파일 캐시에 보관할 최대 개수
+# 원 단위 가격은 float32로도 손실 없이 표현되므로 메모리와 차트 전송량을 절반으로 줄인다
+OHLCV_DTYPES = {'Open': 'float32', 'High': 'float32', 'Low': 'float32', 'Close': 'float32', 'Volume': 'int64'}
+
+# 차트 JSON 직렬화를 C 구현(orjson)으로 처리
+pio.json.config.default_engine = 'orjson'
 
 # --- 함수 정의 ---
-@st.cache_data
-def get_krx_company_list() -> pd.DataFrame:
+def compute_mas_cumsum(close: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # 누적합 한 번으로 세 이동평균을 구한다: ma[i] = (cs[i+1] - cs[i+1-N]) / N
+    cs = np.empty(close.size + 1)
+    cs[0] = 0.0
+    np.cumsum(close, out=cs[1:])
+    mas = []
+    for window in MA_WINDOWS:
+        ma = np.full(close.size, np.nan)
+        ma[window - 1:] = (cs[window:] - cs[:-window]) / window
+        mas.append(ma)
+    return mas[0], mas[1], mas[2]
+
+def compute_mas_loop(close: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # 종가 배열을 한 번만 순회하며 20/60/120일 이동평균을 동시에 계산
+    n = close.shape[0]
+    ma20 = np.empty(n)
+    ma60 = np.empty(n)
+    ma120 = np.empty(n)
+    s20 = 0.0
+    s60 = 0.0
+    s120 = 0.0
+    for i in range(n):
+        c = close[i]
+        s20 += c
+        s60 += c
+        s120 += c
+        if i >= 20:
+            s20 -= close[i - 20]
+        if i >= 60:
+            s60 -= close[i - 60]
+        if i >= 120:
+            s120 -= close[i - 120]
+        ma20[i] = s20 / 20 if i >= 19 else np.nan
+        ma60[i] = s60 / 60 if i >= 59 else np.nan
+        ma120[i] = s120 / 120 if i >= 119 else np.nan
+    return ma20, ma60, ma120
+
+@st.cache_resource
+def get_ma_kernel():
+    # 프로세스당 한 번만 컴파일하고(디스크 캐시 재사용), 스크립트 재실행 시에도 같은 함수 객체를 쓴다
+    if not HAS_NUMBA:
+        return compute_mas_cumsum
+    kernel = njit(MA_KERNEL_SIGNATURE, cache=True, fastmath=True, nogil=True, boundscheck=False)(compute_mas_loop)
+    kernel(np.zeros(121, dtype=np.float64))
+    return kernel
+
+# 첫 조회 시 JIT 컴파일 지연이 생기지 않도록 앱 시작 시점에 미리 준비
+get_ma_kernel()
+
+@st.cache_resource
+def get_redis_client() -> redis.Redis:
+    # 모든 워커가 공유하는 캐시. 연결이 안 되면 빠르게 포기하도록 타임아웃을 짧게 둔다
+    return redis.Redis.from_url(REDIS_URL, socket_connect_timeout=0.5, socket_timeout=0.5)
+
+@st.cache_resource
+def get_http_client() -> httpx.Client:
+    # 워커 내 모든 세션이 keep-alive 연결을 재사용하도록 프로세스당 하나만 만든다
+    return httpx.Client(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        timeout=httpx.Timeout(10.0),
+        headers={'Accept-Encoding': 'zstd, br, gzip'},
+        follow_redirects=True,
+    )
+
+def redis_get(key: str) -> bytes | None:
     try:
-        url = 'http://kind.krx.co.kr/corpgeneral/corpList.do?method=download&searchType=13'
-        df_listing = pd.read_html(url, header=0, flavor='bs4', encoding='EUC-KR')[0]
-        
-        df_listing = df_listing[['회사명', '종목코드']].copy()
-        df_listing['종목코드'] = df_listing['종목코드'].apply(lambda x: f'{x:06}')
-        return df_listing
-    except Exception as e:
-        st.error(f"상장사 명단을 불러오는 데 실패했습니다: {e}")
-        return pd.DataFrame(columns=['회사명', '종목코드'])
+        return get_redis_client().get(key)
+    except redis.RedisError:
+        return None
+
+def redis_get_many(*keys: str) -> list[bytes | None]:
+    # 여러 키를 한 번의 왕복으로 읽는다
+    try:
+        pipe = get_redis_client().pipeline(transaction=False)
+        for key in keys:
+            pipe.get(key)
+        return pipe.execute()
+    except redis.RedisError:
+        return [None] * len(keys)
+
+def redis_set(key: str, value: bytes, ex: int | None = None) -> None:
+    try:
+        get_redis_client().set(key, value, ex=ex)
+    except redis.RedisError:
+        pass
+
+def df_to_bytes(df: pd.DataFrame, index_col: str | None = None) -> bytes:
+    # Feather(Arrow IPC, lz4 압축)로 저장. Feather는 기본 RangeIndex만 허용하므로 인덱스는 컬럼으로 풀어 둔다
+    df = df.rename_axis(index_col).reset_index() if index_col else df.reset_index(drop=True)
+    buf = BytesIO()
+    df.to_feather(buf, compression='lz4')
+    return buf.getvalue()
+
+def df_from_bytes(data: bytes | None, index_col: str | None = None) -> pd.DataFrame | None:
+    # 값이 없거나 읽을 수 없는 형식이면 캐시 미스로 취급한다
+    if data is None:
+        return None
+    try:
+        df = pd.read_feather(BytesIO(data))
+        return df.set_index(index_col) if index_col else df
+    except (pa.ArrowException, KeyError):
+        return None
+
+@st.cache_data(ttl=KRX_LIST_TTL, show_spinner=False)
+def load_krx_company_list() -> pd.DataFrame:
+    # 새로 받은(또는 Redis에 있는 당일) 명단만 캐시한다. 실패하면 예외를 올려 캐시에 남지 않게 한다
+    key = f"{KRX_CACHE_PREFIX}:list:{datetime.date.today().isoformat()}"
+    cached = df_from_bytes(redis_get(key))
+    if cached is not None:
+        return cached
+
+    resp = get_http_client().get(KRX_LIST_URL)
+    resp.raise_for_status()
+    df_listing = pd.read_html(StringIO(resp.content.decode('cp949', errors='replace')), header=0, flavor='lxml')[0]
+    
+    df_listing = df_listing[['회사명', '종목코드']].copy()
+    df_listing['종목코드'] = df_listing['종목코드'].astype(str).str.zfill(6)
+
+    payload = df_to_bytes(df_listing)
+    redis_set(key, payload, ex=KRX_LIST_TTL)
+    redis_set(f"{KRX_CACHE_PREFIX}:list:latest", payload, ex=KRX_LIST_FALLBACK_TTL)
+    return df_listing
+
+def get_stale_krx_company_list(error: Exception) -> pd.DataFrame:
+    # KRX 장애 시 마지막으로 저장된 명단으로 대체 (캐시하지 않으므로 KRX가 복구되면 바로 새 명단을 쓴다)
+    stale = df_from_bytes(redis_get(f"{KRX_CACHE_PREFIX}:list:latest"))
+    if stale is not None:
+        st.warning(f"상장사 명단을 새로 불러오지 못해 최근 저장된 명단을 사용합니다: {error}")
+        return stale
+    st.error(f"상장사 명단을 불러오는 데 실패했습니다: {error}")
+    return pd.DataFrame(columns=['회사명', '종목코드'])
+
+@st.cache_resource(ttl=KRX_LIST_TTL, show_spinner=False)
+def get_krx_name_to_code() -> dict[str, str]:
+    # 읽기 전용 dict이므로 복사(역직렬화) 없이 같은 객체를 공유해 조회가 해시 한 번으로 끝나게 한다
+    df_listing = load_krx_company_list()
+    return dict(zip(df_listing['회사명'], df_listing['종목코드']))
+
+def downcast_ohlcv(price_df: pd.DataFrame) -> pd.DataFrame:
+    return price_df.astype({k: v for k, v in OHLCV_DTYPES.items() if k in price_df.columns})
+
+def is_today_range(end_date: str) -> bool:
+    return end_date >= datetime.date.today().strftime("%Y%m%d")
+
+def covers_start(full_df: pd.DataFrame | None, full_start: str | None, start_date: str) -> bool:
+    # 첫 거래일(index[0])은 휴장일·상장일 때문에 요청 시작일보다 늦을 수 있으므로, 저장 당시 요청한 시작일과 비교한다
+    return full_df is not None and not full_df.empty and full_start is not None and full_start <= start_date
+
+def fetch_ohlcv_incremental(stock_code: str, start_date: str, end_date: str,
+                            full_df: pd.DataFrame | None, full_start: str | None) -> pd.DataFrame:
+    # 종목별 전체 시계열을 저장해 두고, 마지막 저장일 이후 구간만 새로 받아 이어 붙인다
+    if not covers_start(full_df, full_start, start_date):
+        full_df = fdr.DataReader(stock_code, start_date, end_date)
+        full_start = start_date
+    else:
+        # 마지막 저장일은 장중 값이었을 수 있으므로 그날부터 다시 받는다
+        last_date = full_df.index[-1]
+        tail_df = fdr.DataReader(stock_code, last_date.strftime("%Y%m%d"), end_date)
+        if not tail_df.empty:
+            full_df = pd.concat([full_df[full_df.index < last_date], tail_df])
+            if 'Change' in full_df.columns:
+                full_df['Change'] = full_df['Close'].pct_change()
+
+    full_df = downcast_ohlcv(full_df)
+    if not full_df.empty:
+        full_key = f"{OHLCV_CACHE_PREFIX}:{stock_code}:full"
+        redis_set(full_key, df_to_bytes(full_df, OHLCV_INDEX_COL), ex=OHLCV_TTL_HISTORY)
+        redis_set(f"{full_key}:start", full_start.encode(), ex=OHLCV_TTL_HISTORY)
+    return full_df.loc[pd.Timestamp(start_date):]
+
+def fetch_price_data(stock_code: str, start_date: str, end_date: str) -> tuple[pd.DataFrame, bool]:
+    # L2(Redis) -> 원천(FinanceDataReader) 순으로 조회. 두 번째 값은 장애로 인해 저장본을 썼는지 여부
+    key = f"{OHLCV_CACHE_PREFIX}:{stock_code}:{start_date}:{end_date}"
+    full_key = f"{OHLCV_CACHE_PREFIX}:{stock_code}:full"
+    cached, full_cached, full_start = redis_get_many(key, full_key, f"{full_key}:start")
+    cached_df = df_from_bytes(cached, OHLCV_INDEX_COL)
+    if cached_df is not None:
+        return cached_df, False
+    full_df = df_from_bytes(full_cached, OHLCV_INDEX_COL)
+    full_start = full_start.decode() if full_start is not None else None
+
+    is_today = is_today_range(end_date)
+    try:
+        if is_today:
+            price_df = fetch_ohlcv_incremental(stock_code, start_date, end_date, full_df, full_start)
+        else:
+            price_df = downcast_ohlcv(fdr.DataReader(stock_code, start_date, end_date))
+    except Exception:
+        # 데이터 소스 장애 시 저장된 전체 시계열이 요청 구간의 시작을 포함할 때만 잘라 보여준다
+        if not covers_start(full_df, full_start, start_date):
+            raise
+        stale_df = full_df.loc[pd.Timestamp(start_date):pd.Timestamp(end_date)]
+        if stale_df.empty:
+            raise
+        return stale_df, True
+
+    if not price_df.empty:
+        redis_set(key, df_to_bytes(price_df, OHLCV_INDEX_COL), ex=OHLCV_TTL_TODAY if is_today else OHLCV_TTL_HISTORY)
+    return price_df, False
+
+def ohlcv_l1_ttu(key: tuple[str, str, str], value: pd.DataFrame, now: float) -> float:
+    return now + (OHLCV_TTL_TODAY if is_today_range(key[2]) else OHLCV_TTL_HISTORY)
+
+@st.cache_resource
+def get_ohlcv_l1() -> tuple[TLRUCache, threading.Lock]:
+    # 프로세스 내 L1 캐시. 세션마다 다른 스레드에서 접근하므로 락과 함께 보관한다
+    return TLRUCache(maxsize=OHLCV_L1_MAXSIZE, ttu=ohlcv_l1_ttu, timer=time.monotonic), threading.Lock()
+
+def get_price_data(stock_code: str, start_date: str, end_date: str) -> pd.DataFrame:
+    l1, lock = get_ohlcv_l1()
+    key = (stock_code, start_date, end_date)
+    with lock:
+        price_df = l1.get(key)
+
+    if price_df is None:
+        price_df, is_stale = fetch_price_data(stock_code, start_date, end_date)
+        if is_stale:
+            st.warning("실시간 데이터를 불러오지 못해 마지막으로 저장된 데이터를 표시합니다.")
+        elif not price_df.empty:
+            with lock:
+                l1[key] = price_df
+
+    # 호출 측에서 지표 컬럼을 추가하므로 캐시된 객체는 복사해서 넘긴다
+    return price_df.copy()
+
+def downsample_ohlcv(price_df: pd.DataFrame, max_points: int = CHART_MAX_POINTS) -> pd.DataFrame:
+    # 긴 기간은 연속된 봉을 묶어 시가/고가/저가/종가/거래량을 다시 계산한다
+    n = len(price_df)
+    if n <= max_points:
+        return price_df
+
+    bucket = -(-n // max_points)
+    agg = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum',
+           'MA20': 'last', 'MA60': 'last', 'MA120': 'last'}
+    chart_df = price_df.groupby(np.arange(n) // bucket).agg({k: v for k, v in agg.items() if k in price_df.columns})
+    chart_df.index = price_df.index[::bucket]
+    return chart_df
+
+def df_fingerprint(df: pd.DataFrame) -> tuple:
+    # 전체 내용 해시 대신 기간·행 수와 종가/거래량 합계로 구분한다 (같은 기간의 다른 종목도 구분됨)
+    if df.empty:
+        return (tuple(df.columns), 0)
+    return (tuple(df.columns), len(df), df.index[0], df.index[-1],
+            float(df['Close'].sum()), int(df['Volume'].sum()))
+
+@st.cache_data(show_spinner=False, ttl=EXPORT_CACHE_TTL, max_entries=EXPORT_CACHE_MAX_ENTRIES, hash_funcs={pd.DataFrame: df_fingerprint})
+def build_xlsx(price_df: pd.DataFrame) -> bytes:
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        price_df.to_excel(writer, index=True, sheet_name='Stock_Data')
+    return output.getvalue()
+
+@st.cache_data(show_spinner=False, ttl=EXPORT_CACHE_TTL, max_entries=EXPORT_CACHE_MAX_ENTRIES, hash_funcs={pd.DataFrame: df_fingerprint})
+def build_parquet(price_df: pd.DataFrame) -> bytes:
+    output = BytesIO()
+    price_df.to_parquet(output, engine='pyarrow', compression='zstd')
+    return output.getvalue()
+
+@st.cache_resource
+def get_krx_failure_state() -> dict:
+    # 최근 명단 다운로드 실패 기록. 장애 중 매 조회마다 타임아웃을 기다리지 않도록 잠시 재시도를 막는다
+    return {'until': 0.0, 'error': None}
 
 def get_stock_code_by_company(company_name: str) -> str:
     if company_name.isdigit() and len(company_name) == 6:
         return company_name
     
-    company_df = get_krx_company_list()
-    codes = company_df[company_df['회사명'] == company_name]['종목코드'].values
-    if len(codes) > 0:
-        return codes[0]
+    failure = get_krx_failure_state()
+    name_to_code = None
+    if time.monotonic() >= failure['until']:
+        try:
+            name_to_code = get_krx_name_to_code()
+        except Exception as e:
+            failure['error'] = e
+            failure['until'] = time.monotonic() + KRX_LIST_FAILURE_TTL
+
+    if name_to_code is None:
+        df_listing = get_stale_krx_company_list(failure['error'])
+        name_to_code = dict(zip(df_listing['회사명'], df_listing['종목코드']))
+
+    stock_code = name_to_code.get(company_name)
+    if stock_code is not None:
+        return stock_code
     else:
         raise ValueError(f"'{company_name}'을 찾을 수 없습니다. 종목코드 6자리를 직접 입력해보세요.")
 
@@ -51,6 +353,146 @@ with st.sidebar:
     company_name = st.text_input('회사명 입력', placeholder="예: 삼성전자")
     confirm_btn = st.button('데이터 조회하기', use_container_width=True)
 
+# --- 분석 화면 ---
+@st.fragment
+def render_analysis(stock_code: str, start_date: str, end_date: str, company_name: str):
+    # 조회 결과 영역만 다시 그려지도록 fragment로 분리 (다운로드 등 내부 위젯 조작 시 전체 스크립트를 재실행하지 않음)
+    try:
+        with st.spinner('실시간 데이터를 분석 중입니다...'):
+            price_df = get_price_data(stock_code, start_date, end_date)
+            
+            if price_df.empty:
+                st.info("해당 기간의 주가 데이터가 없습니다.")
+            else:
+                now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                st.caption(f"📅 데이터 조회 시점: {now}")
+
+                # 지표 계산 (조회 기간이 이동평균 기간보다 짧으면 전부 NaN이므로 해당 컬럼은 만들지 않는다)
+                ma_windows = [w for w in MA_WINDOWS if len(price_df) >= w]
+                if ma_windows:
+                    mas = get_ma_kernel()(price_df['Close'].to_numpy(dtype=np.float64))
+                    for window, ma in zip(MA_WINDOWS, mas):
+                        if window in ma_windows:
+                            price_df[f'MA{window}'] = ma
+
+                # 요약 지표
+                st.subheader(f"🔍 {company_name} ({stock_code}) 요약")
+                    
+                close_arr = price_df['Close'].to_numpy()
+                vol_arr = price_df['Volume'].to_numpy()
+
+                curr_price = int(close_arr[-1])
+                prev_price = int(close_arr[-2])
+                change = curr_price - prev_price
+                change_rate = (change / prev_price) * 100
+                    
+                m1, m2, m3 = st.columns(3)
+                m1.metric("현재가", f"{curr_price:,} KRW", f"{change:,} ({change_rate:.2f}%)")
+                m2.metric("거래량", f"{int(vol_arr[-1]):,}")
+                if 'MA20' in price_df.columns:
+                    m3.metric("최근 20일 평균", f"{int(price_df['MA20'].to_numpy()[-1]):,} KRW")
+                else:
+                    m3.metric("최근 20일 평균", "-")
+
+                st.write("---")
+                # 기존 st.info 부분을 제거하고 아래 코드를 넣으세요.
+                st.markdown(
+                    """
+                    <div style="background-color: #e1f5fe; padding: 15px; border-radius: 5px; border-left: 5px solid #01579b; margin-bottom: 20px;">
+                        <span style="color: #01579b; font-weight: bold;">💡 차트 조작법</span><br>
+                        <div style="color: #01579b; font-size: 0.9rem; margin-top: 5px; line-height: 1.6;">
+                            1. <b>X축 이동:</b> 차트 중앙 클릭 드래그<br>
+                            2. <b>X축 기간 조절:</b> 차트 중앙 마우스 휠<br>
+                            3. <b>가격/거래량 높이 조절:</b> 양측 숫자(축) 위에서 <b>클릭 드래그</b> 또는 <b>마우스 휠</b>
+                        </div>
+                    </div>
+                    """, 
+                    unsafe_allow_html=True
+                )
+                # 3. Plotly 통합 차트 생성
+                chart_df = downsample_ohlcv(price_df)
+                if len(chart_df) < len(price_df):
+                    st.caption(f"조회 기간이 길어 {len(price_df):,}개 봉을 {len(chart_df):,}개 봉으로 묶어 표시합니다.")
+
+                # 검증 과정이 데이터 크기에 비례해 비싸므로, 값이 확정된 dict 트레이스로 만들고 검증을 건너뛴다
+                # 숫자 배열은 Plotly가 base64 바이너리(typed array)로 보내므로 작은 dtype으로 넘기고,
+                # 날짜는 일 단위 문자열로 줄여 JSON 크기를 줄인다
+                x = np.datetime_as_string(chart_df.index.to_numpy(), unit='D')
+                # 3-1. 캔들 차트 (Y축 사용)
+                traces = [{
+                    'type': 'candlestick', 'x': x,
+                    'open': chart_df['Open'].to_numpy(), 'high': chart_df['High'].to_numpy(),
+                    'low': chart_df['Low'].to_numpy(), 'close': chart_df['Close'].to_numpy(),
+                    'name': '주가', 'yaxis': 'y',
+                }]
+
+                # 3-2. 이동평균선 (WebGL 렌더링, 계산하지 않은 선은 생략)
+                for window, color in ((20, 'orange'), (60, 'blue')):
+                    if f'MA{window}' in chart_df.columns:
+                        traces.append({
+                            'type': 'scattergl', 'x': x, 'y': chart_df[f'MA{window}'].to_numpy(dtype=np.float32),
+                            'name': f'{window}일선', 'line': {'color': color, 'width': 1},
+                        })
+
+                # 3-3. 거래량 (Y2축 사용)
+                traces.append({
+                    'type': 'bar', 'x': x, 'y': chart_df['Volume'].to_numpy(),
+                    'name': '거래량', 'marker': {'color': 'lightgray'},
+                    'opacity': 0.4, 'yaxis': 'y2',
+                })
+
+                # 3-4. 레이아웃 설정
+                layout = {
+                    'dragmode': "pan",
+                    'xaxis': {
+                        'title': {'text': "날짜"},
+                        'fixedrange': False,
+                        'rangeslider': {'visible': False},
+                    },
+                    'yaxis': {
+                        'title': {'text': "가격 (KRW)"},
+                        'side': "right",
+                        'fixedrange': True,
+                    },
+                    'yaxis2': {
+                        'title': {'text': "거래량"},
+                        'side': "left",
+                        'overlaying': "y",
+                        'fixedrange': True,
+                        'range': [0, float(chart_df["Volume"].max()) * 1.1],
+                        'showgrid': False,
+                    },
+                    'height': 600,
+                }
+
+                fig = go.Figure(data=traces, layout=layout, _validate=False)
+
+                st.plotly_chart(
+                    fig,
+                    use_container_width=True,
+                    config={
+                        "scrollZoom": True,
+                        "doubleClick": "reset",
+                        "displaylogo": False,
+                        "modeBarButtonsToRemove": [
+                            "zoom2d",
+                            "autoScale2d",
+                            "select2d",
+                            "lasso2d"
+                        ]
+                    }
+                )
+
+                with st.expander("📊 데이터 상세 보기 및 엑셀 다운로드"):
+                    st.dataframe(price_df.sort_index(ascending=False), use_container_width=True)
+                    # 파일은 다운로드 버튼을 누를 때에만 만든다
+                    d1, d2 = st.columns(2)
+                    d1.download_button(label="📥 엑셀 파일 다운로드", data=lambda: build_xlsx(price_df), file_name=f"{company_name}_주가데이터.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", on_click="ignore", width="stretch")
+                    d2.download_button(label="📥 Parquet 파일 다운로드", data=lambda: build_parquet(price_df), file_name=f"{company_name}_주가데이터.parquet", mime="application/vnd.apache.parquet", on_click="ignore", width="stretch")
+
+    except Exception as e:
+        st.error(f"오류가 발생했습니다: {e}")
+
 # --- 메인 로직 ---
 if confirm_btn:
     if not company_name:
@@ -59,126 +501,10 @@ if confirm_btn:
         st.error("시작일과 종료일을 모두 선택해 주세요.")
     else:
         try:
-            with st.spinner('실시간 데이터를 분석 중입니다...'):
+            with st.spinner('종목 정보를 확인하는 중입니다...'):
                 stock_code = get_stock_code_by_company(company_name)
-                start_date = selected_dates[0].strftime("%Y%m%d")
-                end_date = selected_dates[1].strftime("%Y%m%d")
-                
-                price_df = fdr.DataReader(stock_code, start_date, end_date)
-                
-                if price_df.empty:
-                    st.info("해당 기간의 주가 데이터가 없습니다.")
-                else:
-                    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    st.caption(f"📅 데이터 조회 시점: {now}")
-
-                    # 지표 계산
-                    price_df['MA20'] = price_df['Close'].rolling(window=20).mean()
-                    price_df['MA60'] = price_df['Close'].rolling(window=60).mean()
-                    price_df['MA120'] = price_df['Close'].rolling(window=120).mean()
-
-                    # 요약 지표
-                    st.subheader(f"🔍 {company_name} ({stock_code}) 요약")
-                    
-                    curr_price = int(price_df['Close'].iloc[-1])
-                    prev_price = int(price_df['Close'].iloc[-2])
-                    change = curr_price - prev_price
-                    change_rate = (change / prev_price) * 100
-                    
-                    m1, m2, m3 = st.columns(3)
-                    m1.metric("현재가", f"{curr_price:,} KRW", f"{change:,} ({change_rate:.2f}%)")
-                    m2.metric("거래량", f"{int(price_df['Volume'].iloc[-1]):,}")
-                    m3.metric("최근 20일 평균", f"{int(price_df['MA20'].iloc[-1]):,} KRW")
-
-                    st.write("---")
-                    # 기존 st.info 부분을 제거하고 아래 코드를 넣으세요.
-                    st.markdown(
-                        """
-                        <div style="background-color: #e1f5fe; padding: 15px; border-radius: 5px; border-left: 5px solid #01579b; margin-bottom: 20px;">
-                            <span style="color: #01579b; font-weight: bold;">💡 차트 조작법</span><br>
-                            <div style="color: #01579b; font-size: 0.9rem; margin-top: 5px; line-height: 1.6;">
-                                1. <b>X축 이동:</b> 차트 중앙 클릭 드래그<br>
-                                2. <b>X축 기간 조절:</b> 차트 중앙 마우스 휠<br>
-                                3. <b>가격/거래량 높이 조절:</b> 양측 숫자(축) 위에서 <b>클릭 드래그</b> 또는 <b>마우스 휠</b>
-                            </div>
-                        </div>
-                        """, 
-                        unsafe_allow_html=True
-                    )
-                    # 3. Plotly 통합 차트 생성
-                    fig = go.Figure()
-
-                    # 3-1. 캔들 차트 (Y축 사용)
-                    fig.add_trace(go.Candlestick(
-                        x=price_df.index,
-                        open=price_df['Open'], high=price_df['High'],
-                        low=price_df['Low'], close=price_df['Close'],
-                        name='주가',
-                        yaxis='y'
-                    ))
-
-                    # 3-2. 이동평균선
-                    fig.add_trace(go.Scatter(x=price_df.index, y=price_df['MA20'], name='20일선', line=dict(color='orange', width=1)))
-                    fig.add_trace(go.Scatter(x=price_df.index, y=price_df['MA60'], name='60일선', line=dict(color='blue', width=1)))
-
-                    # 3-3. 거래량 (Y2축 사용)
-                    fig.add_trace(go.Bar(
-                        x=price_df.index, y=price_df['Volume'], 
-                        name='거래량', marker_color='lightgray', 
-                        opacity=0.4, yaxis='y2'
-                    ))
-
-                    # 3-4. 레이아웃 설정
-                    fig.update_layout(
-                        dragmode="pan",
-
-                        xaxis=dict(
-                            title="날짜",
-                            fixedrange=False,
-                            rangeslider=dict(visible=False)
-                        ),
-
-                        yaxis=dict(
-                            title="가격 (KRW)",
-                            side="right",
-                            fixedrange=True
-                        ),
-
-                        yaxis2=dict(
-                            title="거래량",
-                            side="left",
-                            overlaying="y",
-                            fixedrange=True,
-                            range=[0, price_df["Volume"].max() * 1.1],
-                            showgrid=False
-                        ),
-
-                        height=600
-                    )
-
-
-                    st.plotly_chart(
-                        fig,
-                        use_container_width=True,
-                        config={
-                            "scrollZoom": True,
-                            "doubleClick": "reset",
-                            "displaylogo": False,
-                            "modeBarButtonsToRemove": [
-                                "zoom2d",
-                                "autoScale2d",
-                                "select2d",
-                                "lasso2d"
-                            ]
-                        }
-                    )
-
-                    with st.expander("📊 데이터 상세 보기 및 엑셀 다운로드"):
-                        st.dataframe(price_df.sort_index(ascending=False), use_container_width=True)
-                        output = BytesIO()
-                        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                            price_df.to_excel(writer, index=True, sheet_name='Stock_Data')
-                        st.download_button(label="📥 엑셀 파일 다운로드", data=output.getvalue(), file_name=f"{company_name}_주가데이터.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-
+            start_date = selected_dates[0].strftime("%Y%m%d")
+            end_date = selected_dates[1].strftime("%Y%m%d")
+            render_analysis(stock_code, start_date, end_date, company_name)
         except Exception as e:
-            st.error(f"오류가 발생했습니다: {e}")
\ No newline at end of file
+            st.error(f"오류가 발생했습니다: {e}")